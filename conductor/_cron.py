@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import functools
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from crontab import CronTab
+
+# 5-7 whitespace-separated fields, or an @-keyword like @hourly.
+_CRON_RE = re.compile(r"^\s*(?:@\w+|\S+(?:\s+\S+){4,6})\s*$")
+
+
+def is_well_formed(expr: str) -> bool:
+    return _CRON_RE.match(expr) is not None
+
+
+@functools.lru_cache(maxsize=512)
+def parse_crontab(expr: str) -> CronTab:
+    from crontab import CronTab
+
+    return CronTab(expr)
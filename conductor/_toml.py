@@ -0,0 +1,22 @@
+from typing import Any, MutableMapping
+
+try:
+    import tomllib  # type: ignore
+except ModuleNotFoundError:
+    try:
+        import tomli as tomllib  # type: ignore
+    except ModuleNotFoundError:
+        tomllib = None  # type: ignore
+
+if tomllib is None:
+    import toml
+
+    TOMLDecodeError = toml.TomlDecodeError
+else:
+    TOMLDecodeError = tomllib.TOMLDecodeError
+
+
+def loads(text: str) -> MutableMapping[str, Any]:
+    if tomllib is None:
+        return toml.loads(text)
+    return tomllib.loads(text)
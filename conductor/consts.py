@@ -2,4 +2,5 @@ from pathlib import Path
 
 RUN_NEXT_DIR: Path = Path("config")
 JOBS_DIR: Path = Path("jobs")
+POLL_PERIOD: int = 60  # seconds
 NoneType: type = type(None)
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    from .job import Job
+
+
+class JobFormatError(Exception):
+    pass
+
+
+class JobFormatWarning(Warning):
+    def __init__(self, job: Job, *args: Sequence[str]):
+        self.job = job
+        super().__init__(*args)
@@ -1,32 +1,93 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import os
+import shlex
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from time import strftime
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from datetime import date, datetime, time
 from pathlib import Path
-from typing import Any, MutableMapping, Optional, Sequence, Type, Union
-
-from crontab import CronTab
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    MutableMapping,
+    Optional,
+    TextIO,
+    Tuple,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+
+if TYPE_CHECKING:
+    from crontab import CronTab
 
 from . import consts
+from ._cron import is_well_formed, parse_crontab
 from .consts import NoneType
+from .exceptions import JobFormatError, JobFormatWarning
 from .utils import log
 
 
-class JobFormatError(Exception):
-    pass
-
-
-class JobFormatWarning(Warning):
-    def __init__(self, job: Job, *args: Sequence[str]):
-        self.job = job
-        super().__init__(*args)
-
-
-@dataclass
+@functools.lru_cache(maxsize=512)
+def _split_command(command: str) -> Union[str, Tuple[str, ...]]:
+    if os.name == "nt":
+        # posix-mode shlex eats the backslashes in paths like
+        # C:\scripts\run.bat; Popen applies MS quoting rules to a string
+        return command
+    return tuple(shlex.split(command))
+
+
+# dedicated pool so job I/O never competes with (or exhausts) the
+# loop's default executor; pump threads sit blocked on pipe reads, so
+# size for concurrent runs rather than CPUs
+_JOB_EXECUTOR = ThreadPoolExecutor(max_workers=64, thread_name_prefix="job")
+
+# pumps run in executor threads, so the handle cache and all writes
+# through shared handles are guarded by one lock
+_log_lock = threading.Lock()
+# template -> (expanded filename, handle); handles persist across runs
+_log_files: Dict[str, Tuple[str, TextIO]] = {}
+# handle -> number of pumps currently writing through it
+_log_refs: Dict[TextIO, int] = {}
+
+
+def _acquire_log(template: str) -> TextIO:
+    with _log_lock:
+        filename = strftime(template)
+        cached = _log_files.get(template)
+        if cached is not None and cached[0] == filename:
+            fp = cached[1]
+        else:
+            if cached is not None and cached[1] not in _log_refs:
+                # rotated out with pumps still attached: closed on release
+                cached[1].close()
+            fp = open(filename, "a", buffering=1, encoding="utf-8")
+            _log_files[template] = (filename, fp)
+        _log_refs[fp] = _log_refs.get(fp, 0) + 1
+        return fp
+
+
+def _release_log(template: str, fp: TextIO):
+    with _log_lock:
+        refs = _log_refs[fp] - 1
+        if refs:
+            _log_refs[fp] = refs
+            return
+        del _log_refs[fp]
+        cached = _log_files.get(template)
+        if cached is None or cached[1] is not fp:
+            fp.close()
+
+
+@dataclass(slots=True, frozen=True)
 class Job:
     name: str
     id: str
@@ -38,6 +99,40 @@ class Job:
     start: Optional[Union[datetime, date]] = None
     end: Optional[Union[datetime, date]] = None
     environment: Optional[MutableMapping[str, Any]] = None
+    _env: MutableMapping[str, Any] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_env", {**os.environ, **(self.environment or {})})
+
+    @property
+    def tab(self) -> CronTab:
+        return parse_crontab(self.crontab)
+
+    def _spawn(self) -> subprocess.Popen:
+        cwd = self.directory or consts.JOBS_DIR
+        return subprocess.Popen(
+            _split_command(self.command),
+            stdout=subprocess.PIPE if self.stdout is not None else subprocess.DEVNULL,
+            stderr=subprocess.PIPE if self.stderr is not None else subprocess.DEVNULL,
+            env=self._env,
+            cwd=cwd,
+            encoding="utf-8",
+        )
+
+    @staticmethod
+    def _pump(pipe: Any, target: Union[str, Path]):
+        template = str(target)
+        fp = None
+        try:
+            for line in pipe:
+                if fp is None:
+                    fp = _acquire_log(template)
+                with _log_lock:
+                    # pumps sharing a handle must not interleave fragments
+                    log(line.rstrip("\n"), file=fp)
+        finally:
+            if fp is not None:
+                _release_log(template, fp)
 
     @classmethod
     def from_data(
@@ -57,42 +152,28 @@ class Job:
     ) -> MutableMapping[str, Any]:
         job_id = filepath.stem
 
-        job: Optional[MutableMapping[str, Any]] = data.pop("job", None)
-        if job is None:
+        job_section = data.get("job")
+        if job_section is None:
             raise JobFormatError(f"Job {job_id} missing [job] section")
 
+        job: MutableMapping[str, Any] = dict(job_section)
         job["id"] = job_id
-        job["environment"] = data.pop("environment", {})
-        annot = cls.__annotations__  # pylint: disable=no-member
+        job["environment"] = data.get("environment", {})
 
-        for field, type_ in annot.items():
-            realtype = eval(type_)
+        for field, realtype, optional in _VALIDATION_SPEC:
             value = job.get(field)
-            origin = getattr(realtype, "__origin__", None)
-            optional = origin is Union and realtype.__args__[-1] is NoneType
-
-            if optional:
-                args = realtype.__args__
-                if len(args) > 2:
-                    realtype = Union[args[:-1]]  # type: ignore
-                else:
-                    realtype = args[0]
-                    origin = getattr(realtype, "__origin__", None)
-            elif value is None:
-                raise JobFormatError(f"Job {job_id} missing required field {field}")
-
-            if origin is Union:
-                realtype = realtype.__args__
-            elif origin is not None:
-                realtype = origin
-
-            if value is not None and not isinstance(value, realtype):
+            if value is None:
+                if not optional:
+                    raise JobFormatError(f"Job {job_id} missing required field {field}")
+            elif not isinstance(value, realtype):
                 raise JobFormatError(
                     f"Field {field} in job {job_id} got {type(value)} but expected {realtype}"
                 )
 
+        if not is_well_formed(job["crontab"]):
+            raise JobFormatError(f"Job {job_id} has invalid crontab entry")
         try:
-            CronTab(job["crontab"])
+            parse_crontab(job["crontab"])
         except ValueError:
             raise JobFormatError(f"Job {job_id} has invalid crontab entry")
 
@@ -109,19 +190,21 @@ class Job:
 
     @classmethod
     def warn(cls, job: MutableMapping[str, Any], data: MutableMapping[str, Any]):
-        annot = cls.__annotations__  # pylint: disable=no-member
+        extra_fields = job.keys() - _FIELD_SET
+        extra_sections = data.keys() - {"job", "environment"}
+        if not extra_fields and not extra_sections:
+            return
+
         job_id = job["id"]
         warnings = []
 
-        fields = set(job)
-        extra_fields = fields - set(annot)
         if extra_fields:
             for field in extra_fields:
                 del job[field]
             warnings.append(f"extra field(s) {', '.join(extra_fields)}")
 
-        if data:
-            warnings.append(f"extra section(s) {', '.join(data)}")
+        if extra_sections:
+            warnings.append(f"extra section(s) {', '.join(extra_sections)}")
 
         if warnings:
             raise JobFormatWarning(
@@ -141,23 +224,49 @@ class Job:
                 job["end"] = datetime.combine(end, time.min)
 
     async def run(self):
-        cwd = self.directory or consts.JOBS_DIR
-        process = await asyncio.create_subprocess_shell(
-            self.command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env={**os.environ, **self.environment},
-            cwd=cwd,
-        )
-
-        stdout, stderr = map(str.strip, map(bytes.decode, await process.communicate()))
-
-        if stdout and self.stdout is not None:
-            filename = strftime(self.stdout)
-            with open(filename, "a", encoding="utf-8") as fp:
-                log(stdout, file=fp)
-
-        if stderr and self.stderr is not None:
-            filename = strftime(self.stderr)
-            with open(filename, "a", encoding="utf-8") as fp:
-                log(stderr, file=fp)
+        # Popen blocks on the exec error pipe for the whole fork+exec
+        # window, so spawn and pump the pipes off the event loop thread.
+        loop = asyncio.get_running_loop()
+        process = await loop.run_in_executor(_JOB_EXECUTOR, self._spawn)
+
+        pumps = []
+        if self.stdout is not None:
+            pumps.append(
+                loop.run_in_executor(
+                    _JOB_EXECUTOR, self._pump, process.stdout, self.stdout
+                )
+            )
+        if self.stderr is not None:
+            pumps.append(
+                loop.run_in_executor(
+                    _JOB_EXECUTOR, self._pump, process.stderr, self.stderr
+                )
+            )
+        if pumps:
+            await asyncio.gather(*pumps)
+
+        # the pipes are at EOF by now; poll instead of parking a thread
+        # on wait() for the whole run
+        while process.poll() is None:
+            await asyncio.sleep(0.5)
+
+
+def _build_validation_spec() -> Tuple[Tuple[str, Tuple[type, ...], bool], ...]:
+    spec = []
+    hints = get_type_hints(Job)
+    for name in (f.name for f in fields(Job) if f.init):
+        hint = hints[name]
+        origin = get_origin(hint)
+        args = get_args(hint)
+        optional = origin is Union and NoneType in args
+        if origin is Union:
+            members = tuple(arg for arg in args if arg is not NoneType)
+        else:
+            members = (hint,)
+        realtype = tuple(get_origin(member) or member for member in members)
+        spec.append((name, realtype, optional))
+    return tuple(spec)
+
+
+_VALIDATION_SPEC = _build_validation_spec()
+_FIELD_SET = frozenset(field for field, _, _ in _VALIDATION_SPEC)
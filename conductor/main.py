@@ -1,27 +1,39 @@
 #!/usr/bin/env python
 import asyncio
+import heapq
+import itertools
+import os
 import sys
 import traceback
-import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Iterable, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-import toml
-from crontab import CronTab
-
-from . import consts
-from .job import Job, JobFormatError, JobFormatWarning
+from . import _toml, consts
+from .exceptions import JobFormatError, JobFormatWarning
+from .job import Job
 from .utils import load_run_next, log, update_run_next
 
-POLL_PERIOD: int = 60  # seconds
+try:
+    from watchfiles import awatch  # type: ignore
+except ModuleNotFoundError:
+    awatch = None  # type: ignore
+
+# filepath -> (st_mtime_ns, st_size, Job, warning); Job is None while the
+# file fails to parse, so a fix written in place is picked up on re-stat
+_JOB_CACHE: Dict[str, Tuple[int, int, Optional[Job], str]] = {}
+_jobs_dir_mtime_ns: Optional[int] = None
 
 
 class Main:
     def __init__(self):
-        self.tasks: Dict[str, asyncio.Task] = {}
+        self.tasks: Set[asyncio.Task] = set()
         self.jobs: Dict[str, Job] = {}
+        self.heap: List[Tuple[datetime, int, str, Job]] = []
         self.run_next_dict: Dict[str, datetime] = load_run_next()
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Future] = None
 
     def load_jobs(self) -> Set[str]:
         job_ids = set()
@@ -29,95 +41,247 @@ class Main:
             job_id = new_job.id
             job_ids.add(job_id)
             old_job = self.jobs.get(job_id)
+            if new_job is old_job:
+                # unchanged file served straight from the job cache
+                continue
             if new_job != old_job:
                 if warnings:
                     log(warnings)
                 self.jobs[job_id] = new_job
                 if old_job is not None:
                     log(f"Reloaded job {job_id}")
-                    self.tasks[job_id].cancel()
-                run_next = self.run_next_dict.get(job_id)
-                self.tasks[job_id] = asyncio.create_task(
-                    self.schedule_job(new_job, run_next)
-                )
+                self.schedule_job(new_job, self.run_next_dict.get(job_id))
         return job_ids
 
     def prune_jobs(self, jobs_to_keep: Set[str]):
         jobs_to_delete = self.jobs.keys() - jobs_to_keep
         for job_id in jobs_to_delete:
-            self.tasks.pop(job_id).cancel()
+            # stale heap entries are dropped by the scheduler's identity
+            # check; in-flight run tasks finish on their own
             del self.jobs[job_id]
 
-    def print_task_exceptions(self):
-        for job_id, task in self.tasks.items():
-            if task.done():
-                e = task.exception()
-                if e is not None:
-                    log(f"Task {job_id} failed with exception:")
-                    traceback.print_exception(
-                        type(e), e, e.__traceback__, file=sys.stdout
-                    )
+    def schedule_job(self, job: Job, run_next: Optional[datetime] = None):
+        now = datetime.now()
+
+        if job.start is not None and job.start > now:
+            log(f"Not starting job {job.id}: start date in the future")
+            return
+
+        if job.end is not None and job.end <= now:
+            log(f"Not starting job {job.id}: end date in the past")
+            return
+
+        if run_next is None:
+            run_next = now + timedelta(seconds=job.tab.next(now, default_utc=False))
+            update_run_next({job.id: run_next})
+
+        self._push(job, run_next)
+
+    def _push(self, job: Job, when: datetime):
+        heapq.heappush(self.heap, (when, next(self._counter), job.id, job))
+        self._wake_scheduler()
+
+    def _wake_scheduler(self):
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    async def _sleep(self, loop: asyncio.AbstractEventLoop, delay: Optional[float]):
+        # a bare future plus a timer is cheaper than wait_for, which
+        # wraps the wait in its own Task; _wake_scheduler ends it early
+        fut = loop.create_future()
+        self._wakeup = fut
+        handle = (
+            # _wake_scheduler may beat the timer to the future
+            loop.call_later(delay, lambda: fut.done() or fut.set_result(None))
+            if delay is not None
+            else None
+        )
+        try:
+            await fut
+        finally:
+            self._wakeup = None
+            if handle is not None:
+                handle.cancel()
+
+    async def run_scheduler(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            if not self.heap:
+                await self._sleep(loop, None)
+                continue
+
+            when, _, job_id, job = self.heap[0]
+            if self.jobs.get(job_id) is not job:
+                heapq.heappop(self.heap)
+                continue
+
+            now = datetime.now()
+            delta = (when - now).total_seconds()
+            if delta > 0:
+                # an earlier entry may be pushed mid-sleep; re-check the top
+                await self._sleep(loop, delta)
+                continue
+
+            heapq.heappop(self.heap)
+            self._fire(job, now)
+
+    def _fire(self, job: Job, now: datetime):
+        if job.end is not None and job.end <= now:
+            log(f"Stopping job {job.id}: end date reached")
+            return
+
+        log(f"Starting job {job.id}")
+        # a set rather than one slot per job id: runs slower than their
+        # cron interval overlap, and each task must be awaited for errors
+        task = asyncio.create_task(job.run(), name=job.id)
+        task.add_done_callback(self._finish_task)
+        self.tasks.add(task)
+
+        next_run = now + timedelta(seconds=job.tab.next(now, default_utc=False))
+        self._push(job, next_run)
+        update_run_next({job.id: next_run})
+
+    def _finish_task(self, task: asyncio.Task):
+        # done callback: runs as soon as the task ends, so failures are
+        # reported even when the jobs directory never changes
+        self.tasks.discard(task)
+        if task.cancelled():
+            return
+        e = task.exception()
+        if e is not None:
+            log(f"Task {task.get_name()} failed with exception:")
+            traceback.print_exception(type(e), e, e.__traceback__, file=sys.stdout)
 
     async def poll(self):
+        if hasattr(asyncio, "eager_task_factory"):  # Python 3.12+
+            # lets tasks that finish synchronously skip a loop round-trip
+            asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
         self.load_jobs()
         log(f"Loaded {len(self.jobs)} jobs")
 
-        while True:
-            await asyncio.sleep(POLL_PERIOD)
+        scheduler_task = asyncio.create_task(self.run_scheduler())
+
+        if awatch is not None:
+            # event-driven reload: wake only when the jobs directory
+            # changes, but still fail fast if the scheduler dies
+            watch_task = asyncio.create_task(self._watch_jobs())
+            done, _ = await asyncio.wait(
+                {scheduler_task, watch_task}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()  # propagate the failure
+        else:
+            while True:
+                await asyncio.sleep(consts.POLL_PERIOD)
 
-            # load new jobs
-            new_jobs = self.load_jobs()
+                if scheduler_task.done():
+                    scheduler_task.result()  # propagate the failure
 
-            # prune removed jobs
-            self.prune_jobs(jobs_to_keep=new_jobs)
+                self._poll_once()
 
-            # check for exceptions
-            self.print_task_exceptions()
+    async def _watch_jobs(self):
+        async for _ in awatch(consts.JOBS_DIR):
+            self._poll_once()
+
+    def _poll_once(self):
+        # load new jobs
+        new_jobs = self.load_jobs()
+
+        # prune removed jobs
+        self.prune_jobs(jobs_to_keep=new_jobs)
 
     @staticmethod
     def get_jobs() -> Iterable[Tuple[Job, str]]:
-        with warnings.catch_warnings():
-            for filepath in Path(consts.JOBS_DIR).glob("*.toml"):
-                try:
-                    with open(filepath, encoding="utf-8") as fp:
-                        data = toml.load(fp)
-                    job = Job.from_data(data, filepath)
-                except toml.TomlDecodeError:
-                    log(f"Job file {filepath} is not valid TOML")
-                except JobFormatError as e:
-                    log(e)
-                except JobFormatWarning as w:
-                    yield w.job, str(w)
+        global _jobs_dir_mtime_ns
+
+        dir_stat = os.stat(consts.JOBS_DIR)
+        if dir_stat.st_mtime_ns == _jobs_dir_mtime_ns:
+            # nothing added, removed, or renamed; revalidate known files only
+            yield from Main._refresh_cached()
+            return
+        _jobs_dir_mtime_ns = dir_stat.st_mtime_ns
+
+        seen = set()
+        stale = []
+        with os.scandir(consts.JOBS_DIR) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".toml") or not entry.is_file():
+                    continue
+                seen.add(entry.path)
+                stat = entry.stat()
+                cached = _JOB_CACHE.get(entry.path)
+                if (
+                    cached is not None
+                    and cached[0] == stat.st_mtime_ns
+                    and cached[1] == stat.st_size
+                ):
+                    if cached[2] is not None:
+                        yield cached[2], cached[3]
                 else:
-                    yield job, ""
+                    stale.append((entry.path, stat))
 
-    @staticmethod
-    async def schedule_job(job: Job, run_next: datetime = None):
-        now = datetime.now()
+        for key in _JOB_CACHE.keys() - seen:
+            del _JOB_CACHE[key]
 
-        if job.start is not None and job.start > now:
-            log(f"Not starting job {job.id}: start date in the future")
+        if not stale:
             return
+        with ThreadPoolExecutor(max_workers=min(32, len(stale))) as executor:
+            for (path, stat), result in zip(
+                stale, executor.map(Main._load_job, (Path(p) for p, _ in stale))
+            ):
+                if result is not None:
+                    _JOB_CACHE[path] = (stat.st_mtime_ns, stat.st_size, *result)
+                    yield result
+                else:
+                    _JOB_CACHE[path] = (stat.st_mtime_ns, stat.st_size, None, "")
 
-        if job.end is not None and job.end <= now:
-            log(f"Not starting job {job.id}: end date in the past")
-            return
+    @staticmethod
+    def _refresh_cached() -> Iterable[Tuple[Job, str]]:
+        for path, (mtime_ns, size, job, warning) in list(_JOB_CACHE.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del _JOB_CACHE[path]
+                continue
+            if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+                if job is not None:
+                    yield job, warning
+                continue
+            result = Main._load_job(Path(path))
+            if result is None:
+                _JOB_CACHE[path] = (stat.st_mtime_ns, stat.st_size, None, "")
+            else:
+                _JOB_CACHE[path] = (stat.st_mtime_ns, stat.st_size, *result)
+                yield result
 
-        tab = CronTab(job.crontab)
+    @staticmethod
+    def _load_job(filepath: Path) -> Optional[Tuple[Job, str]]:
+        try:
+            with open(filepath, "rb") as fp:
+                raw = fp.read()
+        except OSError as e:
+            log(f"Could not read job file {filepath}: {e}")
+            return None
 
-        if run_next is None:
-            now = datetime.now()
-            secs_til_next = tab.next(now, default_utc=False)
-            next_run = now + timedelta(seconds=secs_til_next)
-            update_run_next({job.id: next_run})
-        else:
-            secs_til_next = (run_next - datetime.now()).total_seconds()
+        # reject obvious garbage without invoking the parser
+        if not raw.strip():
+            log(f"Job file {filepath} is empty")
+            return None
+        if b"\x00" in raw[:64]:
+            log(f"Job file {filepath} is not valid TOML")
+            return None
 
-        while True:
-            await asyncio.sleep(secs_til_next)
-            log(f"Starting job {job.id}")
-            await job.run()
-            now = datetime.now()
-            secs_til_next = tab.next(now, default_utc=False)
-            next_run = now + timedelta(seconds=secs_til_next)
-            update_run_next({job.id: next_run})
+        try:
+            data = _toml.loads(raw.decode("utf-8"))
+            job = Job.from_data(data, filepath)
+        except (UnicodeDecodeError, _toml.TOMLDecodeError):
+            log(f"Job file {filepath} is not valid TOML")
+        except JobFormatError as e:
+            log(e)
+        except JobFormatWarning as w:
+            return w.job, str(w)
+        else:
+            return job, ""
+        return None
@@ -3,11 +3,14 @@ import os
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import MutableMapping
+from typing import MutableMapping, Optional
 
-import toml
+from . import _toml, consts
 
-from . import consts
+FLUSH_DELAY = 1.0  # seconds
+
+_run_next: Optional[MutableMapping[str, datetime]] = None
+_flush_handle: Optional[asyncio.TimerHandle] = None
 
 
 def platform_setup():
@@ -18,11 +21,19 @@ def platform_setup():
         )
 
 
+_last_log_second: Optional[datetime] = None
+_last_log_stamp: str = ""
+
+
 def log(*args, **kwargs):
+    global _last_log_second, _last_log_stamp
     kwargs.setdefault("flush", True)
-    now = datetime.now()
-    args = (now.strftime(r"[%Y-%m-%d %H:%M:%S]"), *args)
-    return print(*args, **kwargs)
+    second = datetime.now().replace(microsecond=0)
+    if second != _last_log_second:
+        # isoformat is a C fast path, unlike strftime
+        _last_log_second = second
+        _last_log_stamp = f"[{second.isoformat(sep=' ')}]"
+    return print(_last_log_stamp, *args, **kwargs)
 
 
 def process_env_vars():
@@ -36,28 +47,72 @@ def process_env_vars():
     if run_next_dir is not None:
         consts.RUN_NEXT_DIR = Path(run_next_dir)
 
+    poll_period = os.environ.get("CONDUCTOR_POLL_PERIOD")
+    if poll_period is not None:
+        consts.POLL_PERIOD = int(poll_period)
+
 
 def load_run_next() -> MutableMapping[str, datetime]:
+    global _run_next
+    if _run_next is None:
+        _run_next = _read_run_next()
+    return _run_next
+
+
+def _read_run_next() -> MutableMapping[str, datetime]:
     try:
         os.makedirs(consts.RUN_NEXT_DIR)
     except FileExistsError:
         pass
 
     try:
-        fp = open(f"{consts.RUN_NEXT_DIR}/run_next.blob", encoding="utf-8")
+        with open(f"{consts.RUN_NEXT_DIR}/run_next.blob", encoding="utf-8") as fp:
+            text = fp.read()
     except FileNotFoundError:
         return {}
-    else:
-        with fp:
-            return toml.load(fp)  # type: ignore
+
+    try:
+        return {
+            job_id: datetime.fromisoformat(stamp)
+            for job_id, _, stamp in (
+                line.partition("\t") for line in text.splitlines() if line
+            )
+        }
+    except ValueError:
+        # blob written by a version that stored TOML; rewritten on next save
+        return _toml.loads(text)  # type: ignore
 
 
 def save_run_next(data: MutableMapping[str, datetime]):
-    with open(f"{consts.RUN_NEXT_DIR}/run_next.blob", "w", encoding="utf-8") as fp:
-        toml.dump(data, fp)
+    filename = f"{consts.RUN_NEXT_DIR}/run_next.blob"
+    tmp = f"{filename}.tmp"
+    payload = "".join(
+        f"{job_id}\t{when.isoformat()}\n" for job_id, when in data.items()
+    )
+    with open(tmp, "w", encoding="utf-8") as fp:
+        fp.write(payload)
+        if os.environ.get("CONDUCTOR_FSYNC") == "1":
+            fp.flush()
+            os.fsync(fp.fileno())
+    os.replace(tmp, filename)
 
 
 def update_run_next(new_data: MutableMapping[str, datetime]):
+    global _flush_handle
     data = load_run_next()
     data.update(new_data)
-    save_run_next(new_data)
+
+    if _flush_handle is not None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        save_run_next(data)
+        return
+    _flush_handle = loop.call_later(FLUSH_DELAY, _flush)
+
+
+def _flush():
+    global _flush_handle
+    _flush_handle = None
+    save_run_next(load_run_next())
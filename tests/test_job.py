@@ -1,5 +1,35 @@
-from conductor.job import Job
+from pathlib import Path
+
+import pytest
+import toml
+
+from conductor.job import Job, JobFormatError
+
+JOB_FILE = Path(__file__).parent / "simple_job.toml"
 
 
 def test_from_data():
-    pass
+    with open(JOB_FILE, encoding="utf-8") as fp:
+        data = toml.load(fp)
+
+    job = Job.from_data(data, JOB_FILE)
+
+    assert job.id == "simple_job"
+    assert job.name == "A Job"
+    assert job.command == "echo"
+    assert job.crontab == "* * * * *"
+    assert job.environment == {"foo": "bar"}
+
+
+def test_from_data_missing_field():
+    data = {"job": {"name": "A Job", "command": "echo"}}
+
+    with pytest.raises(JobFormatError):
+        Job.from_data(data, JOB_FILE)
+
+
+def test_from_data_wrong_type():
+    data = {"job": {"name": "A Job", "command": "echo", "crontab": 5}}
+
+    with pytest.raises(JobFormatError):
+        Job.from_data(data, JOB_FILE)